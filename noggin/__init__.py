@@ -23,6 +23,12 @@ app.config.from_envvar('NOGGIN_CONFIG_PATH')
 if app.config.get('TEMPLATES_AUTO_RELOAD'):
     app.jinja_env.auto_reload = True
 
+# Server-side sessions, if configured
+if app.config.get('SESSION_TYPE'):
+    from flask_session import Session
+
+    Session(app)
+
 ipa_admin = IPAAdmin(app)
 
 # Theme support
@@ -7,7 +7,14 @@ from noggin.form.add_group_member import AddGroupMemberForm
 from noggin.form.remove_group_member import RemoveGroupMemberForm
 from noggin.representation.group import Group
 from noggin.representation.user import User
-from noggin.utility import group_or_404, messaging, undo_button, with_ipa
+from noggin.utility import (
+    group_or_404,
+    invalidate_group,
+    invalidate_user,
+    messaging,
+    undo_button,
+    with_ipa,
+)
 from noggin.utility.pagination import paginated_find
 from noggin_messages import MemberSponsorV1
 
@@ -79,6 +86,8 @@ def group_add_member(ipa, groupname):
                     'danger',
                 )
             return redirect(url_for('group', groupname=groupname))
+        invalidate_group(groupname)
+        invalidate_user(username)
 
         flash_text = _(
             'You got it! %(username)s has been added to %(groupname)s.',
@@ -131,6 +140,8 @@ def group_remove_member(ipa, groupname):
             for error in e.message['member']['user']:
                 flash('Unable to remove user %s: %s' % (error[0], error[1]), 'danger')
             return redirect(url_for('group', groupname=groupname))
+        invalidate_group(groupname)
+        invalidate_user(username)
         flash_text = _(
             'You got it! %(username)s has been removed from %(groupname)s.',
             username=username,
@@ -91,7 +91,9 @@ def user_settings_password(ipa, username):
     form = PasswordResetForm()
 
     # check if an OTP token exists. If so, the user is using OTP.
-    using_otp = bool(ipa.otptoken_find(o_ipatokenowner=username)["result"])
+    using_otp = bool(
+        ipa.otptoken_find(o_ipatokenowner=username, o_pkey_only=True)["result"]
+    )
 
     if not using_otp:
         form.current_password.description = ""
@@ -1,9 +1,23 @@
+import hashlib
+import json
+import os
 from urllib.parse import quote, urlparse
 
 import python_freeipa
-from flask import flash, Markup, redirect, render_template, session, url_for
-from flask_babel import _
+from flask import (
+    abort,
+    flash,
+    make_response,
+    Markup,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
+from flask_babel import _, get_locale
 
+import noggin
 from noggin import app
 from noggin.form.edit_user import (
     UserSettingsAddOTPForm,
@@ -17,56 +31,144 @@ from noggin.representation.group import Group
 from noggin.representation.otptoken import OTPToken
 from noggin.representation.user import User
 from noggin.security.ipa import maybe_ipa_login
-from noggin.utility import messaging, require_self, user_or_404, with_ipa
+from noggin.utility import (
+    cache_key,
+    invalidate_user,
+    ipa_cache,
+    messaging,
+    require_self,
+    user_or_404,
+    with_ipa,
+)
 from noggin.utility.forms import FormError, handle_form_errors
 from noggin_messages import UserUpdateV1
 
 
+def _user_page_results(ipa, username):
+    # The user page requires a logged-in user, so there is always a cache key.
+    key = cache_key("user", username, "page")
+    results = ipa_cache.get(key)
+    if results is None:
+        # As a speed optimization, we make two separate group calls: just doing a
+        # group_find (with all=True) is super slow here, with a lot of groups.
+        # All the calls are sent to the server in a single batch request.
+        group_params = {"fasgroup": True, "all": False, "no_members": True}
+        try:
+            results = ipa.batch_results(
+                [
+                    {
+                        "method": "user_show",
+                        "params": [[username], {"all": True, "no_members": True}],
+                    },
+                    {
+                        "method": "group_find",
+                        "params": [[], {"user": username, **group_params}],
+                    },
+                    {
+                        "method": "group_find",
+                        "params": [
+                            [],
+                            {"membermanager_user": username, **group_params},
+                        ],
+                    },
+                ]
+            )
+        except python_freeipa.exceptions.NotFound:
+            abort(404)
+        ipa_cache.set(key, results)
+    return results
+
+
 @app.route('/user/<username>/')
 @with_ipa()
 def user(ipa, username):
-    user = User(user_or_404(ipa, username))
-    # As a speed optimization, we make two separate calls.
-    # Just doing a group_find (with all=True) is super slow here, with a lot of
-    # groups.
-    member_groups = [
-        Group(g)
-        for g in ipa.group_find(o_user=username, o_all=False, fasgroup=True)['result']
-    ]
-    managed_groups = [
-        Group(g)
-        for g in ipa.group_find(
-            o_membermanager_user=username, o_all=False, fasgroup=True
-        )['result']
-    ]
-    groups = [g for g in managed_groups if g not in member_groups] + member_groups
+    results = _user_page_results(ipa, username)
 
-    return render_template(
-        'user.html',
-        user=user,
-        groups=groups,
-        managed_groups=managed_groups,
-        member_groups=member_groups,
-    )
+    # The page depends on who is looking at it, in which language, and on the deployed
+    # code, templates and configuration.
+    templates = [
+        app.jinja_env.get_template(name).filename
+        for name in ('user.html', 'main.html', 'master.html')
+    ]
+    etag = hashlib.sha256(
+        json.dumps(
+            [
+                session.get('noggin_username'),
+                session.get('noggin_current_user'),
+                str(get_locale()),
+                noggin.__version__,
+                [os.path.getmtime(filename) for filename in templates],
+                [
+                    app.config[name]
+                    for name in ('THEME', 'AVATAR_SERVICE_URL', 'AVATAR_DEFAULT_TYPE')
+                ],
+                results,
+            ],
+            sort_keys=True,
+        ).encode()
+    ).hexdigest()
+    # The browser's copy is still fresh, unless there are messages to flash.
+    if request.if_none_match.contains(etag) and not session.get('_flashes'):
+        response = app.response_class(status=304)
+    else:
+        user_result, member_groups_result, managed_groups_result = results
+        user = User(user_result['result'])
+        member_groups = [Group(g) for g in member_groups_result['result']]
+        managed_groups = [Group(g) for g in managed_groups_result['result']]
+        groups = [g for g in managed_groups if g not in member_groups] + member_groups
+
+        response = make_response(
+            render_template(
+                'user.html',
+                user=user,
+                groups=groups,
+                managed_groups=managed_groups,
+                member_groups=member_groups,
+            )
+        )
+    response.set_etag(etag)
+    # Make the browser check with us before using its copy
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 
-def _user_mod(ipa, form, user, details, redirect_to):
+def _user_mod(ipa, form, username, details, redirect_to):
     with handle_form_errors(form):
         try:
-            updated_user = User(
-                ipa.user_mod(user.username, **details, all=True)['result']
+            # Fetch the previous state of the user and modify it in a single round
+            # trip, the former is needed to list the changed fields in the message.
+            old_user_result, new_user_result = ipa.batch_results(
+                [
+                    {
+                        "method": "user_show",
+                        "params": [[username], {"all": True, "no_members": True}],
+                    },
+                    {
+                        "method": "user_mod",
+                        "params": [
+                            [username],
+                            {**details, "all": True, "no_members": True},
+                        ],
+                    },
+                ]
             )
         except python_freeipa.exceptions.BadRequest as e:
             if e.message == 'no modifications to be performed':
                 raise FormError("non_field_errors", e.message)
             else:
                 app.logger.error(
-                    f'An error happened while editing user {user.username}: {e.message}'
+                    f'An error happened while editing user {username}: {e.message}'
                 )
                 raise FormError("non_field_errors", e.message)
+        user = User(old_user_result['result'])
+        updated_user = User(new_user_result['result'])
+        # Refresh the cached user on the next request
+        session['noggin_current_user'] = None
+        invalidate_user(username)
         flash(
             Markup(
-                f'Profile Updated: <a href=\"{url_for("user", username=user.username)}\">'
+                f'Profile Updated: <a href=\"{url_for("user", username=username)}\">'
                 'view your profile</a>'
             ),
             'success',
@@ -76,47 +178,53 @@ def _user_mod(ipa, form, user, details, redirect_to):
             UserUpdateV1(
                 {
                     "msg": {
-                        "agent": user.username,
-                        "user": user.username,
+                        "agent": username,
+                        "user": username,
                         "fields": user.diff_fields(updated_user),
                     }
                 }
             )
         )
 
-        return redirect(url_for(redirect_to, username=user.username))
+        return redirect(url_for(redirect_to, username=username))
 
 
 @app.route('/user/<username>/settings/profile/', methods=['GET', 'POST'])
 @with_ipa()
 @require_self
 def user_settings_profile(ipa, username):
-    user = User(user_or_404(ipa, username))
-    form = UserSettingsProfileForm(obj=user)
+    form = None
+    if request.method == 'POST':
+        form = UserSettingsProfileForm()
+        if form.validate_on_submit():
+            full_name = f"{form.firstname.data} {form.lastname.data}"
+            result = _user_mod(
+                ipa,
+                form,
+                username,
+                {
+                    'givenname': form.firstname.data,
+                    'sn': form.lastname.data,
+                    'cn': full_name,
+                    'displayname': full_name,
+                    'mail': form.mail.data,
+                    'fasircnick': form.ircnick.data,
+                    'faslocale': form.locale.data,
+                    'fastimezone': form.timezone.data,
+                    'fasgithubusername': form.github.data.lstrip('@'),
+                    'fasgitlabusername': form.gitlab.data.lstrip('@'),
+                    'fasrhbzemail': form.rhbz_mail.data,
+                    'faswebsiteurl': form.website_url.data,
+                },
+                "user_settings_profile",
+            )
+            if result:
+                return result
 
-    if form.validate_on_submit():
-        result = _user_mod(
-            ipa,
-            form,
-            user,
-            {
-                'o_givenname': form.firstname.data,
-                'o_sn': form.lastname.data,
-                'o_cn': '%s %s' % (form.firstname.data, form.lastname.data),
-                'o_displayname': '%s %s' % (form.firstname.data, form.lastname.data),
-                'o_mail': form.mail.data,
-                'fasircnick': form.ircnick.data,
-                'faslocale': form.locale.data,
-                'fastimezone': form.timezone.data,
-                'fasgithubusername': form.github.data.lstrip('@'),
-                'fasgitlabusername': form.gitlab.data.lstrip('@'),
-                'fasrhbzemail': form.rhbz_mail.data,
-                'faswebsiteurl': form.website_url.data,
-            },
-            "user_settings_profile",
-        )
-        if result:
-            return result
+    # Only fetch the user when we actually render the page
+    user = User(user_or_404(ipa, username, refresh=True))
+    if form is None:
+        form = UserSettingsProfileForm(obj=user)
 
     return render_template(
         'user-settings-profile.html', user=user, form=form, activetab="profile"
@@ -127,27 +235,32 @@ def user_settings_profile(ipa, username):
 @with_ipa()
 @require_self
 def user_settings_keys(ipa, username):
-    user = User(user_or_404(ipa, username))
-    form = UserSettingsKeysForm(obj=user)
-
-    if form.validate_on_submit():
-        result = _user_mod(
-            ipa,
-            form,
-            user,
-            {'o_ipasshpubkey': form.sshpubkeys.data, 'fasgpgkeyid': form.gpgkeys.data},
-            "user_settings_keys",
+    form = None
+    if request.method == 'POST':
+        form = UserSettingsKeysForm()
+        if form.validate_on_submit():
+            result = _user_mod(
+                ipa,
+                form,
+                username,
+                {
+                    'ipasshpubkey': form.sshpubkeys.data,
+                    'fasgpgkeyid': form.gpgkeys.data,
+                },
+                "user_settings_keys",
+            )
+            if result:
+                return result
+
+    # Only fetch the user when we actually render the page
+    user = User(user_or_404(ipa, username, refresh=True))
+    # Only add new fields when the form is displayed for the first time. Otherwise,
+    # more fields will show up with every validation error.
+    if form is None:
+        # Add 2 empty entries at the bottom of each list
+        form = UserSettingsKeysForm(
+            sshpubkeys=user.sshpubkeys + ["", ""], gpgkeys=user.gpgkeys + ["", ""]
         )
-        if result:
-            return result
-
-    # if the form has errors, we don't want to add new fields. otherwise,
-    # more fields will show up with every validation error
-    if not form.errors:
-        # Append 2 empty entries at the bottom of the gpgkeys fieldlist
-        for i in range(2):
-            form.gpgkeys.append_entry()
-            form.sshpubkeys.append_entry()
 
     return render_template(
         'user-settings-keys.html', user=user, form=form, activetab="keys"
@@ -159,7 +272,6 @@ def user_settings_keys(ipa, username):
 @require_self
 def user_settings_otp(ipa, username):
     addotpform = UserSettingsAddOTPForm()
-    user = User(user_or_404(ipa, username))
     if addotpform.validate_on_submit():
         try:
             maybe_ipa_login(app, session, username, addotpform.password.data)
@@ -191,9 +303,26 @@ def user_settings_otp(ipa, username):
     otp_uri = session.get('otp_uri')
     session['otp_uri'] = None
 
-    tokens = [
-        OTPToken(t) for t in ipa.otptoken_find(o_ipatokenowner=username)["result"]
-    ]
+    try:
+        user_result, tokens_result = ipa.batch_results(
+            [
+                {
+                    "method": "user_show",
+                    "params": [[username], {"all": True, "no_members": True}],
+                },
+                {
+                    "method": "otptoken_find",
+                    "params": [
+                        [],
+                        {"ipatokenowner": username, "all": False, "no_members": True},
+                    ],
+                },
+            ]
+        )
+    except python_freeipa.exceptions.NotFound:
+        abort(404)
+    user = User(user_result['result'])
+    tokens = [OTPToken(t) for t in tokens_result["result"]]
     tokens.sort(key=lambda t: t.description or "")
 
     return render_template(
@@ -273,7 +402,6 @@ def user_settings_otp_delete(ipa, username):
     form = UserSettingsOTPStatusChange()
 
     if form.validate_on_submit():
-        username = session.get('noggin_username')
         token = form.token.data
         try:
             ipa.otptoken_del(a_ipatokenuniqueid=token)
@@ -304,7 +432,7 @@ def user_settings_otp_delete(ipa, username):
 @with_ipa()
 @require_self
 def user_settings_agreements(ipa, username):
-    user = User(user_or_404(ipa, username))
+    user = User(user_or_404(ipa, username, with_members=True))
     agreements = [
         Agreement(a) for a in ipa.fasagreement_find(all=False, ipaenabledflag=True)
     ]
@@ -327,6 +455,7 @@ def user_settings_agreements(ipa, username):
                 'danger',
             )
         else:
+            invalidate_user(user.username)
             flash(
                 _('You signed the "%(name)s" agreement.', name=agreement_name),
                 "success",
@@ -3,8 +3,27 @@ import random
 import python_freeipa
 from cryptography.fernet import Fernet
 from python_freeipa.client_meta import ClientMeta as IPAClient
-from python_freeipa.exceptions import BadRequest
+from python_freeipa.exceptions import BadRequest, parse_error
 from requests import RequestException
+from requests.adapters import HTTPAdapter
+
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+# The connection pool is shared by all the clients, so that the connections
+# (and their TLS handshakes) to the IPA servers are reused between requests. The
+# cookies are stored in each client's session, not in the pool.
+http_adapter = HTTPAdapter(pool_maxsize=32)
+
+
+def _decode_with_orjson(response, *args, **kwargs):
+    """Response hook to decode the JSON payload with the faster orjson library."""
+    response.json = lambda **kwargs: orjson.loads(response.content)
+    return response
 
 
 class Client(IPAClient):
@@ -14,12 +33,36 @@ class Client(IPAClient):
     TODO: send this upstream.
     """
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session.mount("https://", http_adapter)
+        if orjson is not None:
+            self._session.hooks['response'].append(_decode_with_orjson)
+
     def ping(self):
         """
         Checks that the server is alive.
         """
         return self._request("ping")
 
+    def batch_results(self, methods):
+        """
+        Run several commands in a single request to the server.
+
+        Unlike ``batch()``, this will raise an exception if one of the commands
+        failed.
+
+        :param methods: the commands to run, in the same format as ``batch()``
+        :type methods: list
+        :return: the result of each command, in the same order
+        :rtype: list
+        """
+        results = self.batch(a_methods=methods)['results']
+        for result in results:
+            if result['error']:
+                parse_error({'message': result['error'], 'code': result['error_code']})
+        return results
+
     def otptoken_sync(self, user, password, first_code, second_code, token=None):
         """
         Sync an otptoken for a user.
@@ -176,6 +219,8 @@ def maybe_ipa_login(app, session, username, userpassword):
         session['noggin_session'] = encrypted_session
         session['noggin_ipa_server_hostname'] = chosen_server
         session['noggin_username'] = username
+        # Drop the cached data of any previously logged-in user
+        session['noggin_current_user'] = None
         return client
 
     return None
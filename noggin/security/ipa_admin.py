@@ -32,6 +32,7 @@ class IPAAdmin(object):
         "stageuser_del",
         "stageuser_mod",
         "batch",
+        "batch_results",
         "fasagreement_add",
         "fasagreement_add_group",
         "fasagreement_del",
@@ -49,13 +50,14 @@ class IPAAdmin(object):
 
     # Attempt to obtain an administrative IPA session
     def __maybe_ipa_admin_session(self):
-        self.__client = Client(
+        # Don't store the client on the instance: it is shared between threads.
+        client = Client(
             random.choice(self.__app.config['FREEIPA_SERVERS']),
             verify_ssl=self.__app.config['FREEIPA_CACERT'],
         )
-        self.__client.login(self.__username, self.__password)
-        self.__client.ping()
-        return self.__client
+        client.login(self.__username, self.__password)
+        client.ping()
+        return client
 
     def __wrap_method(self, method_name):
         @wraps(getattr(Client, method_name))
@@ -1,4 +1,5 @@
 import datetime
+import json
 import os
 import tempfile
 
@@ -11,27 +12,38 @@ from noggin.app import app
 from noggin.representation.agreement import Agreement
 from noggin.representation.otptoken import OTPToken
 from noggin.security.ipa import maybe_ipa_login, untouched_ipa_client
+from noggin.utility import ipa_cache
+
+
+# Read the FreeIPA CA cert once for the whole test session.
+if os.path.exists("/etc/ipa/ca.crt"):
+    # Use the proper CA file so tests that have no VCR cassette can run
+    with open("/etc/ipa/ca.crt", "rb") as orig_ca:
+        IPA_CA_CERT = orig_ca.read()
+else:
+    # FreeIPA is not installed, this may be CI, just use an empty file because VCR
+    # will mock the requests anyway.
+    IPA_CA_CERT = b""
 
 
 @pytest.fixture(scope="session")
 def ipa_cert():
     """Create a CA cert usable for tests.
 
-    The FreeIPA CA cert file must exist for client requests to work. Use the one provided by a local
-    install of FreeIPA if available, use an empty file otherwise (but in that case the requests must
-    have been recorded by VCR).
+    The FreeIPA CA cert file must exist for client requests to work. On Linux, keep it in
+    memory instead of writing it to the disk.
     """
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("ipa-ca")
+        os.write(fd, IPA_CA_CERT)
+        app.config['FREEIPA_CACERT'] = f"/proc/self/fd/{fd}"
+        yield
+        os.close(fd)
+        return
     with tempfile.NamedTemporaryFile(
         prefix="ipa-ca-", suffix=".crt", delete=False
     ) as cert:
-        if os.path.exists("/etc/ipa/ca.crt"):
-            # Copy the proper CA file so tests that have no VCR cassette can run
-            with open("/etc/ipa/ca.crt", "rb") as orig_ca:
-                cert.write(orig_ca.read())
-        else:
-            # FreeIPA is not installed, this may be CI, just use an empty file
-            # because VCR will mock the requests anyway.
-            pass
+        cert.write(IPA_CA_CERT)
         cert.close()
         app.config['FREEIPA_CACERT'] = cert.name
         yield
@@ -42,11 +54,42 @@ def client(ipa_cert):
     app.config['TESTING'] = True
     app.config['DEBUG'] = True
     app.config['WTF_CSRF_ENABLED'] = False
+    ipa_cache.clear()
     with app.test_client() as client:
         with app.app_context():
             yield client
 
 
+def _batch_calls(request):
+    try:
+        body = json.loads(request.body)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(body, dict) or body.get("method") != "batch":
+        return None
+    return body["params"][0]
+
+
+def ipa_batch_calls(r1, r2):
+    """Match the calls inside IPA batch requests.
+
+    All the IPA calls share the same URI, and VCR doesn't compare the request bodies. The
+    other calls are not compared because their parameters can be random or time-dependent.
+    """
+    assert _batch_calls(r1) == _batch_calls(r2)
+
+
+def _add_ipa_batch_matcher(vcr):
+    vcr.register_matcher("ipa_batch_calls", ipa_batch_calls)
+    vcr.match_on = tuple(vcr.match_on) + ("ipa_batch_calls",)
+    return vcr
+
+
+@pytest.fixture(scope='module')
+def vcr(vcr):
+    return _add_ipa_batch_matcher(vcr)
+
+
 @pytest.fixture(scope='module')
 def vcr_cassette_dir(request):
     # Put all cassettes in cassettes/{module}/{test}.yaml
@@ -74,7 +117,7 @@ def vcr_session(request):
         kwargs['record_mode'] = 'new_episodes'
         kwargs['before_record_response'] = lambda *args, **kwargs: None
     vcr = VCR(**kwargs)
-    yield vcr
+    yield _add_ipa_batch_matcher(vcr)
 
 
 @pytest.fixture(scope="session")
@@ -121,8 +164,11 @@ def make_user(ipa_testing_config):
 
     yield _make_user
 
-    for name in created_users:
-        ipa_admin.user_del(name)
+    # Delete all the users in a single round trip
+    if created_users:
+        ipa_admin.batch_results(
+            [{"method": "user_del", "params": [[name], {}]} for name in created_users]
+        )
 
 
 @pytest.fixture
@@ -204,8 +250,12 @@ def dummy_user_with_otp(client, logged_in_dummy_user):
 def cleanup_dummy_tokens():
     yield
     tokens = ipa_admin.otptoken_find(a_criteria="dummy")
-    for token in [OTPToken(t) for t in tokens["result"]]:
-        ipa_admin.otptoken_del(a_ipatokenuniqueid=token.uniqueid)
+    batch_methods = [
+        {"method": "otptoken_del", "params": [[token.uniqueid], {}]}
+        for token in [OTPToken(t) for t in tokens["result"]]
+    ]
+    if batch_methods:
+        ipa_admin.batch_results(batch_methods)
 
 
 @pytest.fixture
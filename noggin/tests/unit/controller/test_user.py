@@ -1,3 +1,4 @@
+import os
 from unittest import mock
 
 import pytest
@@ -6,7 +7,10 @@ from bs4 import BeautifulSoup
 from fedora_messaging import testing as fml_testing
 
 from noggin import ipa_admin
+from noggin.app import app
+from noggin.form.edit_user import UserSettingsKeysForm, UserSettingsProfileForm
 from noggin.tests.unit.utilities import (
+    assert_form_field_error,
     assert_form_generic_error,
     assert_redirects_with_flash,
 )
@@ -52,6 +56,67 @@ def test_user(client, logged_in_dummy_user):
     assert user_fullname[0].get_text(strip=True) == "Dummy User"
 
 
+@pytest.mark.vcr()
+def test_user_unknown(client, logged_in_dummy_user):
+    """Test the user detail page of a user that does not exist"""
+    result = client.get('/user/unknown/')
+    assert result.status_code == 404
+
+
+@pytest.mark.vcr()
+def test_user_not_modified(client, logged_in_dummy_user):
+    """Test that the user page is not sent again when the browser has it"""
+    result = client.get('/user/dummy/')
+    assert result.status_code == 200
+    etag = result.headers["ETag"]
+    assert result.cache_control.private
+    assert result.cache_control.no_cache
+    # The IPA results are cached, and the page isn't rendered again
+    with mock.patch("noggin.controller.user.render_template") as render_template:
+        result = client.get('/user/dummy/', headers={"If-None-Match": etag})
+    assert result.status_code == 304
+    assert result.headers["ETag"] == etag
+    assert result.data == b""
+    render_template.assert_not_called()
+
+
+@pytest.mark.vcr()
+def test_user_modified(client, logged_in_dummy_user):
+    """Test that the user page is sent again when the viewer or the deployment changed"""
+    result = client.get('/user/dummy/')
+    assert result.status_code == 200
+    etag = result.headers["ETag"]
+    # The viewer changed their email address, which is used for the avatar
+    with client.session_transaction() as sess:
+        current_user = sess["noggin_current_user"]
+        sess["noggin_current_user"] = dict(current_user, mail=["dummy@example.org"])
+    result = client.get('/user/dummy/', headers={"If-None-Match": etag})
+    assert result.status_code == 200
+    assert result.headers["ETag"] != etag
+    etag = result.headers["ETag"]
+    # A new version was deployed
+    with mock.patch("noggin.__version__", "new-version"):
+        result = client.get('/user/dummy/', headers={"If-None-Match": etag})
+    assert result.status_code == 200
+    assert result.headers["ETag"] != etag
+    etag = result.headers["ETag"]
+    # The base template was edited
+    getmtime = os.path.getmtime
+    with mock.patch(
+        "os.path.getmtime",
+        side_effect=lambda path: 0 if path.endswith("master.html") else getmtime(path),
+    ):
+        result = client.get('/user/dummy/', headers={"If-None-Match": etag})
+    assert result.status_code == 200
+    assert result.headers["ETag"] != etag
+    etag = result.headers["ETag"]
+    # The avatar configuration changed
+    with mock.patch.dict(app.config, {"AVATAR_DEFAULT_TYPE": "identicon"}):
+        result = client.get('/user/dummy/', headers={"If-None-Match": etag})
+    assert result.status_code == 200
+    assert result.headers["ETag"] != etag
+
+
 def test_user_unauthed(client):
     """Check that when unauthed, the user page redirects back to /."""
     result = client.get('/user/dudemcpants/')
@@ -66,7 +131,15 @@ def test_user_unauthed(client):
 @pytest.mark.vcr()
 def test_user_edit(client, logged_in_dummy_user):
     """Test getting the user edit page: /user/<username>/settings/profile/"""
-    result = client.get('/user/dummy/settings/profile/')
+    with mock.patch.object(
+        UserSettingsProfileForm,
+        "process",
+        autospec=True,
+        side_effect=UserSettingsProfileForm.process,
+    ) as process:
+        result = client.get('/user/dummy/settings/profile/')
+    # The form is only processed once
+    process.assert_called_once()
     page = BeautifulSoup(result.data, 'html.parser')
     # print(page.prettify())
     assert page.title
@@ -113,6 +186,37 @@ def test_user_edit_post(client, logged_in_dummy_user):
     )
 
 
+@pytest.mark.vcr()
+def test_user_edit_post_group_member(client, dummy_user_as_group_manager):
+    """Test that the group memberships are not reported as changed fields"""
+    with fml_testing.mock_sends(
+        UserUpdateV1(
+            {
+                "msg": {
+                    "agent": "dummy",
+                    "user": "dummy",
+                    "fields": [
+                        'timezone',
+                        'locale',
+                        'ircnick',
+                        'github',
+                        'gitlab',
+                        'rhbz_mail',
+                        'website_url',
+                    ],
+                }
+            }
+        )
+    ):
+        result = client.post('/user/dummy/settings/profile/', data=POST_CONTENTS)
+    assert_redirects_with_flash(
+        result,
+        expected_url="/user/dummy/settings/profile/",
+        expected_message="Profile Updated: <a href=\"/user/dummy/\">view your profile</a>",
+        expected_category="success",
+    )
+
+
 @pytest.mark.vcr()
 def test_user_edit_post_minimal_values(client, logged_in_dummy_user):
     """Test posting to the user edit page: /user/<username>/settings/profile/
@@ -189,18 +293,41 @@ def test_user_edit_post_no_change(client, logged_in_dummy_user):
 @pytest.mark.vcr()
 def test_user_edit_post_bad_request(client, logged_in_dummy_user):
     """Test handling of FreeIPA errors"""
-    with mock.patch("noggin.security.ipa.Client.user_mod") as user_mod:
-        user_mod.side_effect = python_freeipa.exceptions.BadRequest(
+    with mock.patch("noggin.security.ipa.Client.batch_results") as batch_results:
+        batch_results.side_effect = python_freeipa.exceptions.BadRequest(
             message="something went wrong", code="4242"
         )
         result = client.post('/user/dummy/settings/profile/', data=POST_CONTENTS)
     assert_form_generic_error(result, 'something went wrong')
 
 
+@pytest.mark.vcr()
+def test_user_edit_post_invalid(client, logged_in_dummy_user):
+    """Test posting invalid data to the user edit page"""
+    with mock.patch("noggin.security.ipa.Client.batch_results") as batch_results:
+        result = client.post(
+            '/user/dummy/settings/profile/',
+            data={**POST_CONTENTS, "mail": "not-an-email"},
+        )
+    assert_form_field_error(result, "mail", "Email must be valid")
+    batch_results.assert_not_called()
+    # The form is displayed with the submitted data
+    page = BeautifulSoup(result.data, 'html.parser')
+    assert page.select_one("input[name='mail']")["value"] == "not-an-email"
+
+
 @pytest.mark.vcr()
 def test_user_settings_keys(client, logged_in_dummy_user):
     """Test getting the user edit page: /user/<username>/settings/keys/"""
-    result = client.get('/user/dummy/settings/keys/')
+    with mock.patch.object(
+        UserSettingsKeysForm,
+        "process",
+        autospec=True,
+        side_effect=UserSettingsKeysForm.process,
+    ) as process:
+        result = client.get('/user/dummy/settings/keys/')
+    # The form is only processed once
+    process.assert_called_once()
     page = BeautifulSoup(result.data, 'html.parser')
     assert page.title
     assert page.title.string == 'Settings for dummy - noggin'
@@ -210,6 +337,9 @@ def test_user_settings_keys(client, logged_in_dummy_user):
         form[0].find("textarea", attrs={"name": "sshpubkeys-0"}).get_text(strip=True)
         == ""
     )
+    # Two empty entries are displayed for each kind of key
+    assert len(form[0].select("textarea[name^='sshpubkeys-']")) == 2
+    assert len(form[0].select("input[name^='gpgkeys-']")) == 2
 
 
 @pytest.mark.vcr()
@@ -267,14 +397,32 @@ def test_user_settings_keys_post_no_change(client, logged_in_dummy_user):
 @pytest.mark.vcr()
 def test_user_settings_keys_post_bad_request(client, logged_in_dummy_user):
     """Test handling of FreeIPA errors"""
-    with mock.patch("noggin.security.ipa.Client.user_mod") as user_mod:
-        user_mod.side_effect = python_freeipa.exceptions.BadRequest(
+    with mock.patch("noggin.security.ipa.Client.batch_results") as batch_results:
+        batch_results.side_effect = python_freeipa.exceptions.BadRequest(
             message="something went wrong", code="4242"
         )
         result = client.post('/user/dummy/settings/keys/', data=POST_CONTENTS_KEYS)
     assert_form_generic_error(result, 'something went wrong')
 
 
+@pytest.mark.vcr()
+def test_user_settings_keys_post_invalid(client, logged_in_dummy_user):
+    """Test posting invalid data to the user keys page"""
+    with mock.patch("noggin.security.ipa.Client.batch_results") as batch_results:
+        result = client.post(
+            '/user/dummy/settings/keys/',
+            data={**POST_CONTENTS_KEYS, "gpgkeys-0": "0" * 17},
+        )
+    assert_form_field_error(
+        result, "gpgkeys-0", "Field cannot be longer than 16 characters."
+    )
+    batch_results.assert_not_called()
+    # No empty entries are added to the submitted data
+    page = BeautifulSoup(result.data, 'html.parser')
+    assert len(page.select("textarea[name^='sshpubkeys-']")) == 1
+    assert len(page.select("input[name^='gpgkeys-']")) == 1
+
+
 @pytest.mark.vcr()
 def test_user_cant_see_hidden_groups(client, logged_in_dummy_user):
     result = client.get('/user/dummy/')
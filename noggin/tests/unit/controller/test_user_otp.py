@@ -60,6 +60,15 @@ def test_user_settings_otp(client, logged_in_dummy_user):
     assert len(form) == 1
 
 
+@pytest.mark.vcr()
+def test_user_settings_otp_unknown_user(client, logged_in_dummy_user):
+    """Test getting the OTP settings page of a user that does not exist anymore"""
+    with client.session_transaction() as sess:
+        sess["noggin_username"] = "unknown"
+    result = client.get("/user/unknown/settings/otp/")
+    assert result.status_code == 404
+
+
 @pytest.mark.vcr()
 def test_user_settings_otp_no_permission(client, logged_in_dummy_user):
     """Verify that a user's OTP settings page can't be viewed by another user."""
@@ -4,11 +4,13 @@ import pytest
 import requests
 from cryptography.fernet import Fernet
 from flask import current_app
-from python_freeipa.exceptions import BadRequest, FreeIPAError
+from python_freeipa.exceptions import BadRequest, FreeIPAError, NotFound
 
 from noggin import ipa_admin
 from noggin.security.ipa import (
+    _decode_with_orjson,
     Client,
+    http_adapter,
     maybe_ipa_login,
     maybe_ipa_session,
     untouched_ipa_client,
@@ -155,6 +157,77 @@ def test_ipa_client_batch_unknown_option(client, logged_in_dummy_user):
             assert "invalid 'params': Unknown option: pants" in e
 
 
+def test_ipa_client_batch_results():
+    """Check the IPAClient batch_results method"""
+    with patch("noggin.security.ipa.Client._request") as request:
+        request.return_value = {
+            'count': 2,
+            'results': [
+                {'result': {'uid': ['dummy']}, 'error': None},
+                {'result': [], 'count': 0, 'error': None},
+            ],
+        }
+        client = Client("ipa.example.com")
+        results = client.batch_results(
+            [
+                {"method": "user_show", "params": [["dummy"], {}]},
+                {"method": "group_find", "params": [[], {"user": "dummy"}]},
+            ]
+        )
+    assert [r['result'] for r in results] == [{'uid': ['dummy']}, []]
+
+
+def test_ipa_client_batch_results_error():
+    """Check that batch_results raises the errors of the commands"""
+    with patch("noggin.security.ipa.Client._request") as request:
+        request.return_value = {
+            'count': 1,
+            'results': [
+                {
+                    'error': 'unknown: user not found',
+                    'error_code': 4001,
+                    'error_name': 'NotFound',
+                    'error_kw': {},
+                }
+            ],
+        }
+        client = Client("ipa.example.com")
+        with pytest.raises(NotFound):
+            client.batch_results([{"method": "user_show", "params": [["unknown"], {}]}])
+
+
+def test_ipa_client_shared_pool():
+    """The clients should share their connection pool, but not their cookies"""
+    client1 = Client("ipa.example.com")
+    client2 = Client("ipa.example.com")
+    url = "https://ipa.example.com/ipa/session/json"
+    assert client1._session.get_adapter(url) is http_adapter
+    assert client2._session.get_adapter(url) is http_adapter
+    assert client1._session.cookies is not client2._session.cookies
+
+
+def test_ipa_client_orjson():
+    """The JSON responses should be decoded with orjson when it is available"""
+    pytest.importorskip("orjson")
+    client = Client("ipa.example.com")
+    response = requests.Response()
+    response.status_code = 200
+    response._content = b'{"result": {"summary": "IPA server version 4.8.6"}}'
+    with patch("noggin.security.ipa.orjson.loads") as loads:
+        loads.return_value = {"result": "decoded"}
+        for hook in client._session.hooks['response']:
+            response = hook(response) or response
+        assert response.json() == {"result": "decoded"}
+    loads.assert_called_once_with(response.content)
+
+
+def test_ipa_client_no_orjson():
+    """The JSON responses should be decoded by requests when orjson is missing"""
+    with patch("noggin.security.ipa.orjson", None):
+        client = Client("ipa.example.com")
+    assert _decode_with_orjson not in client._session.hooks['response']
+
+
 def test_ipa_client_change_password_error():
     client = Client("ipa.example.com")
     with patch.object(client, "_session") as request:
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from noggin.app import app
+
+
+@pytest.fixture
+def session_config(tmp_path):
+    base_config = os.path.join(os.path.dirname(__file__), "noggin.cfg")
+    config_path = tmp_path / "noggin.cfg"
+    with open(base_config) as f:
+        config = f.read()
+    config += "\nSESSION_TYPE = 'filesystem'\nSESSION_FILE_DIR = {!r}\n".format(
+        str(tmp_path / "sessions")
+    )
+    config_path.write_text(config)
+    return str(config_path)
+
+
+def test_server_side_sessions(session_config):
+    """The app must store sessions server-side when SESSION_TYPE is set"""
+    pytest.importorskip("flask_session")
+    # The app is configured at import time, check it in a fresh interpreter.
+    env = dict(os.environ, NOGGIN_CONFIG_PATH=session_config)
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from noggin import app; print(type(app.session_interface).__name__)",
+        ],
+        env=env,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    assert output.stdout.strip() == "FileSystemSessionInterface"
+
+
+def test_client_side_sessions():
+    """The app must use signed cookies by default"""
+    assert type(app.session_interface).__name__ == "SecureCookieSessionInterface"
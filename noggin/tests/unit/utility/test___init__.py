@@ -1,11 +1,28 @@
 from unittest import mock
 
 import pytest
-from flask import current_app, g, get_flashed_messages, session
+from flask import current_app, g, get_flashed_messages, Markup, session
 from werkzeug.exceptions import InternalServerError, NotFound
 
 from noggin.security.ipa import maybe_ipa_login
-from noggin.utility import group_or_404, require_self, user_or_404, with_ipa
+from noggin.utility import (
+    get_current_user,
+    gravatar,
+    group_or_404,
+    invalidate_user,
+    require_self,
+    undo_button,
+    user_or_404,
+    with_ipa,
+)
+
+
+def test_gravatar(client):
+    """Test the gravatar URL"""
+    assert gravatar("Dummy@Example.com", 50) == (
+        "https://seccdn.libravatar.org/avatar/"
+        "6e8e0bf6135471802a63a17c5e74ddc5?s=50&d=robohash"
+    )
 
 
 @pytest.mark.vcr()
@@ -23,6 +40,36 @@ def test_user_or_404_unknown(client, logged_in_dummy_user):
         user_or_404(logged_in_dummy_user, "unknown")
 
 
+def test_user_or_404_cached(client):
+    """The user should be cached between requests of the same logged-in user"""
+    ipa = mock.Mock()
+    ipa.user_show.return_value = {"result": {"uid": ["dummy"]}}
+    for _i in range(2):
+        with current_app.test_request_context('/'):
+            session["noggin_username"] = "dummy"
+            assert user_or_404(ipa, "dummy") == {"uid": ["dummy"]}
+    ipa.user_show.assert_called_once_with(a_uid="dummy", o_no_members=True)
+    # Another logged-in user has their own cache
+    with current_app.test_request_context('/'):
+        session["noggin_username"] = "other"
+        user_or_404(ipa, "dummy")
+    assert ipa.user_show.call_count == 2
+
+
+def test_user_or_404_refresh(client):
+    """The cache should be skipped when asked to, and when invalidated"""
+    ipa = mock.Mock()
+    ipa.user_show.return_value = {"result": {"uid": ["dummy"]}}
+    with current_app.test_request_context('/'):
+        session["noggin_username"] = "dummy"
+        user_or_404(ipa, "dummy")
+        user_or_404(ipa, "dummy", refresh=True)
+        assert ipa.user_show.call_count == 2
+        invalidate_user("dummy")
+        user_or_404(ipa, "dummy")
+        assert ipa.user_show.call_count == 3
+
+
 @pytest.mark.vcr()
 def test_group_or_404(client, logged_in_dummy_user, dummy_group):
     """Test the group_or_404 method"""
@@ -75,8 +122,43 @@ def test_with_ipa_anonymous(client):
         assert category == "warning"
 
 
+def test_get_current_user(client):
+    """The logged-in user should be cached in the session"""
+    ipa = mock.Mock()
+    ipa.user_find.return_value = {
+        "result": [
+            {"uid": ["dummy"], "mail": ["dummy@example.com"], "ipasshpubkey": ["key"]}
+        ]
+    }
+    with current_app.test_request_context('/'):
+        user = get_current_user(ipa)
+        assert user.username == "dummy"
+        assert session["noggin_current_user"] == {
+            "uid": ["dummy"],
+            "mail": ["dummy@example.com"],
+        }
+        # The second call must not hit IPA
+        assert get_current_user(ipa).username == "dummy"
+    ipa.user_find.assert_called_once_with(whoami=True)
+
+
 def test_require_self_wrong_route(client):
     view = mock.Mock()
     with current_app.test_request_context('/password-reset'):
         with pytest.raises(InternalServerError):
             require_self(view)()
+
+
+def test_undo_button(client):
+    """The undo button should escape its values, but not the hidden tag"""
+    with current_app.test_request_context('/'):
+        result = undo_button(
+            "/group/dummy-group/members/",
+            "username",
+            '"dummy"',
+            Markup('<input type="hidden">'),
+        )
+    assert isinstance(result, Markup)
+    assert 'value="&#34;dummy&#34;"' in result
+    assert '<input type="hidden">' in result
+    assert '<form action="/group/dummy-group/members/" method="post">' in result
@@ -0,0 +1,57 @@
+from unittest import mock
+
+from noggin.utility.cache import TTLCache
+
+
+def test_cache_get_set():
+    cache = TTLCache(maxsize=10, ttl=60)
+    assert cache.get("key") is None
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+
+
+def test_cache_expired():
+    cache = TTLCache(maxsize=10, ttl=60)
+    with mock.patch("noggin.utility.cache.time.monotonic") as monotonic:
+        monotonic.return_value = 1000
+        cache.set("key", "value")
+        monotonic.return_value = 1059
+        assert cache.get("key") == "value"
+        monotonic.return_value = 1060
+        assert cache.get("key") is None
+
+
+def test_cache_maxsize():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("key1", "value1")
+    cache.set("key2", "value2")
+    # Use key1 so that key2 is the least recently used
+    cache.get("key1")
+    cache.set("key3", "value3")
+    assert cache.get("key1") == "value1"
+    assert cache.get("key2") is None
+    assert cache.get("key3") == "value3"
+
+
+def test_cache_disabled():
+    cache = TTLCache(maxsize=10, ttl=0)
+    cache.set("key", "value")
+    assert cache.get("key") is None
+
+
+def test_cache_delete_matching():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set(("user", "dummy", "viewer1"), "value1")
+    cache.set(("user", "dummy", "viewer2"), "value2")
+    cache.set(("user", "other", "viewer1"), "value3")
+    cache.delete_matching(lambda key: key[1] == "dummy")
+    assert cache.get(("user", "dummy", "viewer1")) is None
+    assert cache.get(("user", "dummy", "viewer2")) is None
+    assert cache.get(("user", "other", "viewer1")) == "value3"
+
+
+def test_cache_clear():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("key", "value")
+    cache.clear()
+    assert cache.get("key") is None
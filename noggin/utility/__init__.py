@@ -1,27 +1,65 @@
 import hashlib
-from functools import wraps
+from functools import lru_cache, wraps
 
 import python_freeipa
-from flask import abort, current_app, flash, g, Markup, redirect, session, url_for
+from flask import (
+    abort,
+    current_app,
+    flash,
+    g,
+    has_request_context,
+    Markup,
+    redirect,
+    session,
+    url_for,
+)
 from flask_babel import lazy_gettext as _
 
 from noggin import app
 from noggin.representation.user import User
 from noggin.security.ipa import maybe_ipa_session
+from noggin.utility.cache import TTLCache
+
+
+# Short-lived cache for the user and group lookups, shared between requests.
+ipa_cache = TTLCache(
+    maxsize=app.config["IPA_CACHE_SIZE"], ttl=app.config["IPA_CACHE_TTL"]
+)
+# The avatar settings are read once, when the application starts.
+AVATAR_URL_PREFIX = app.config["AVATAR_SERVICE_URL"] + "avatar/"
+AVATAR_DEFAULT_TYPE = app.config["AVATAR_DEFAULT_TYPE"]
+
+
+# Cache on the email as it is stored, so a cache hit does no string work at all.
+@lru_cache(maxsize=65536)
+def _gravatar_hash(email):
+    return hashlib.md5(email.lower().encode('utf8')).hexdigest()  # nosec
 
 
 def gravatar(email, size):
     return (
-        app.config["AVATAR_SERVICE_URL"]
-        + "avatar/"
-        + hashlib.md5(email.lower().encode('utf8')).hexdigest()  # nosec
-        + "?s="
-        + str(size)
-        + "&d="
-        + app.config["AVATAR_DEFAULT_TYPE"]
+        f"{AVATAR_URL_PREFIX}{_gravatar_hash(email)}"
+        f"?s={size}&d={AVATAR_DEFAULT_TYPE}"
     )
 
 
+# The attributes of the logged-in user that are cached in the session. Only keep
+# what is needed to display the user, the session is usually stored in a cookie.
+CURRENT_USER_ATTRS = ("uid", "mail", "cn", "displayname", "gecos")
+
+
+def get_current_user(ipa):
+    """Return the logged-in user, from the session if it has been cached there"""
+    current_user = session.get('noggin_current_user')
+    if current_user is None:
+        result = ipa.user_find(whoami=True)['result'][0]
+        current_user = {
+            attr: result[attr] for attr in CURRENT_USER_ATTRS if attr in result
+        }
+        session['noggin_current_user'] = current_user
+    return User(current_user)
+
+
 # A wrapper that will give us 'ipa' if it exists, or bump the user back to /
 # with a message telling them to log in.
 def with_ipa():
@@ -31,7 +69,7 @@ def with_ipa():
             ipa = maybe_ipa_session(current_app, session)
             if ipa:
                 g.ipa = ipa
-                g.current_user = User(g.ipa.user_find(whoami=True)['result'][0])
+                g.current_user = get_current_user(ipa)
                 return f(*args, **kwargs, ipa=ipa)
             flash('Please log in to continue.', 'warning')
             return redirect(url_for('root'))
@@ -62,34 +100,80 @@ def require_self(f):
     return fn
 
 
-def group_or_404(ipa, groupname):
-    group = ipa.group_find(o_cn=groupname, fasgroup=True)['result']
-    if not group:
-        abort(404, _('Group %(groupname)s could not be found.', groupname=groupname))
-    else:
-        return group[0]
+def cache_key(object_type, name, *args):
+    # IPA filters the attributes according to who is asking, so cache the
+    # results per logged-in user.
+    if not has_request_context() or not session.get('noggin_username'):
+        return None
+    return (object_type, name, session['noggin_username'], *args)
 
 
-def user_or_404(ipa, username):
-    try:
-        return ipa.user_show(a_uid=username)['result']
-    except python_freeipa.exceptions.NotFound:
-        abort(404)
+def invalidate_user(username):
+    """Remove a user from the cache, for all the logged-in users"""
+    ipa_cache.delete_matching(lambda key: key[:2] == ("user", username))
 
 
-def undo_button(form_action, submit_name, submit_value, hidden_tag):
-    """return an undo button html snippet as a string, to be used in flash messages"""
+def invalidate_group(groupname):
+    """Remove a group from the cache, for all the logged-in users"""
+    ipa_cache.delete_matching(lambda key: key[:2] == ("group", groupname))
 
-    undo_text = _("Undo")
 
-    template = f"""
+def group_or_404(ipa, groupname, refresh=False):
+    key = cache_key("group", groupname)
+    group = None if key is None or refresh else ipa_cache.get(key)
+    if group is None:
+        result = ipa.group_find(o_cn=groupname, fasgroup=True)['result']
+        if not result:
+            abort(
+                404, _('Group %(groupname)s could not be found.', groupname=groupname)
+            )
+        group = result[0]
+        if key is not None:
+            ipa_cache.set(key, group)
+    return group
+
+
+def user_or_404(ipa, username, refresh=False, with_members=False):
+    """Return the user, or abort with a 404 error if it does not exist.
+
+    The group and agreement memberships are only returned if ``with_members`` is
+    True, they can be large.
+    """
+    key = cache_key("user", username, with_members)
+    user = None if key is None or refresh else ipa_cache.get(key)
+    if user is None:
+        try:
+            result = ipa.user_show(a_uid=username, o_no_members=not with_members)
+        except python_freeipa.exceptions.NotFound:
+            abort(404)
+        user = result['result']
+        if key is not None:
+            ipa_cache.set(key, user)
+    return user
+
+
+UNDO_BUTTON_TEMPLATE = app.jinja_env.from_string(
+    """
     <span class='ml-auto' id="flashed-undo-button">
-        <form action="{form_action}" method="post">
-            {hidden_tag}
+        <form action="{{ form_action }}" method="post">
+            {{ hidden_tag }}
             <button type="submit" class="btn btn-outline-success btn-sm"
-             name="{submit_name}" value="{submit_value}">
-                {undo_text}
+             name="{{ submit_name }}" value="{{ submit_value }}">
+                {{ undo_text }}
             </button>
         </form>
     </span>"""
-    return Markup(template)
+)
+
+
+def undo_button(form_action, submit_name, submit_value, hidden_tag):
+    """return an undo button html snippet as a string, to be used in flash messages"""
+    return Markup(
+        UNDO_BUTTON_TEMPLATE.render(
+            form_action=form_action,
+            submit_name=submit_name,
+            submit_value=submit_value,
+            hidden_tag=hidden_tag,
+            undo_text=_("Undo"),
+        )
+    )